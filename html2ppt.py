@@ -1,20 +1,24 @@
 import argparse
 import asyncio
+import functools
+import hashlib
 import os
 import re
 import sys
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from pptx import Presentation
 from pptx.util import Inches, Pt
-from pptx.dml.color import RGBColor
 from pptx.enum.text import PP_ALIGN
-from pptx.enum.shapes import MSO_SHAPE
 from pptx.enum.text import MSO_ANCHOR, PP_PARAGRAPH_ALIGNMENT
 from pptx.enum.dml import MSO_THEME_COLOR
 from pptx.enum.action import PP_ACTION
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls
 import base64
-from PIL import Image
+from PIL import Image, features
 import io
+from xml.sax.saxutils import escape, quoteattr
 
 # --- CONFIGURATION ---
 # Google Slides uses 13.33" x 7.5" at 96 DPI (1280x720) or 16:9 aspect ratio
@@ -23,6 +27,19 @@ SLIDE_HEIGHT_PX = 720  # Changed to 16:9 aspect ratio (Google Slides standard)
 PX_TO_INCH = 1/96
 PPTX_WIDTH = Inches(SLIDE_WIDTH_PX * PX_TO_INCH)
 PPTX_HEIGHT = Inches(SLIDE_HEIGHT_PX * PX_TO_INCH)
+# Default cap on in-flight screenshot calls; beyond the CDP pipeline's knee, queued
+# commands only add latency
+CDP_CONCURRENCY = 16
+# JPEG quality of the embedded slide pictures and element crops; slides are captured as PNG
+# so crops are only compressed once
+SCREENSHOT_QUALITY = 85
+# Screenshots larger than this are downscaled before embedding; anything smaller is embedded as captured
+MAX_IMAGE_WIDTH = 1920
+MAX_IMAGE_HEIGHT = 1080
+
+# Patterns used in the per-text-node loop
+_RE_LINE_BREAK = re.compile(r'[\n\v]')
+_RE_XML_ILLEGAL = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
 
 # Font mapping for better typography preservation
 FONT_MAPPING = {
@@ -47,470 +64,616 @@ FONT_MAPPING = {
     'gabriola': 'Gabriola',
     'geneva': 'Geneva',
     'lucida grande': 'Lucida Grande',
-    'segoe ui': 'Segoe UI',
-    'trebuchet ms': 'Trebuchet MS'
+    'segoe ui': 'Segoe UI'
 }
 
-def hex_to_rgb(hex_str):
-    hex_str = hex_str.lstrip('#')
-    return RGBColor(int(hex_str[0:2], 16), int(hex_str[2:4], 16), int(hex_str[4:6], 16))
-
-def css_rgb_to_pptx_color(css_color):
-    """Converts 'rgb(r, g, b)' or 'rgba(r, g, b, a)' to pptx RGBColor. Returns None for transparent."""
-    if not css_color or 'rgba(0, 0, 0, 0)' in css_color or 'transparent' in css_color:
+# Elements captured as pictures in the editable output
+IMAGE_SELECTORS = [
+    '.viz-box', '.dashboard-placeholder', '.bi', '.corner-icon', '.fa', 
+    'img', 'svg', 'picture', 'canvas', 'video', 'figure', 'figcaption',
+    '.image', '.photo', '.graphic', '.icon', '.logo', '.avatar',
+    '.thumbnail', '.poster', '.banner', '.header-image', '.footer-image'
+]
+
+def rgb_hex(color):
+    """Converts a packed 0xRRGGBB int from the page to an 'RRGGBB' srgbClr value. None (transparent) stays None."""
+    if color is None:
         return None
-    
-    nums = re.findall(r'\d+', css_color)
-    if len(nums) >= 3:
-        return RGBColor(int(nums[0]), int(nums[1]), int(nums[2]))
-    return RGBColor(0, 0, 0) # Fallback
+    return f'{color:06X}'
+
+# Computed text-align keywords -> paragraph alignment; anything else is left-aligned
+ALIGNMENT_MAP = {
+    'center': PP_ALIGN.CENTER,
+    '-webkit-center': PP_ALIGN.CENTER,
+    'right': PP_ALIGN.RIGHT,
+    '-webkit-right': PP_ALIGN.RIGHT,
+    'justify': PP_ALIGN.JUSTIFY,
+}
 
 def map_alignment(align_str):
-    if 'center' in align_str: return PP_ALIGN.CENTER
-    if 'right' in align_str: return PP_ALIGN.RIGHT
-    if 'justify' in align_str: return PP_ALIGN.JUSTIFY
-    return PP_ALIGN.LEFT
-
-def optimize_image(image_path, max_width=1920, max_height=1080, quality=85):
-    """Optimize image to reduce file size while maintaining quality"""
+    return ALIGNMENT_MAP.get(align_str, PP_ALIGN.LEFT)
+
+@functools.lru_cache(maxsize=512)
+def _resolve_font(font_family):
+    """Map a lowercased CSS font-family list to an Office font name."""
+    # Font mapping for better typography preservation
+    for key, value in FONT_MAPPING.items():
+        if key in font_family:
+            return value
+    # Fallback to common fonts
+    if 'times' in font_family: return 'Times New Roman'
+    return 'Calibri'  # Default to Calibri
+
+def resolve_text_style(color, font_size, font_family, font_weight):
+    """Resolve the computed text style into (rgb, size, font name, bold). font_size is in px; size is in
+    hundredths of a point (the sz unit), or None without a font size."""
+    rgb = rgb_hex(color)
+    
+    # Convert px to points (1px = 0.75pt), in centipoints, clamped to the 1-4000pt range the
+    # sz attribute allows
+    size = min(max(int(font_size * 75), 100), 400000) if font_size else None
+    
+    font_name = _resolve_font(font_family.lower())
+    
+    # Handle font weight
+    font_weight = str(font_weight)
+    bold = 'bold' in font_weight or (font_weight.isdigit() and int(font_weight) >= 600)
+    return rgb, size, font_name, bold
+
+# --- Batched shape XML ---
+# The editable pass builds each slide's shapes as one XML fragment and appends it to the
+# shape tree in a single mutation, instead of going through add_shape/add_textbox/add_picture
+# per element. The markup mirrors what those python-pptx calls produce.
+
+# Fixed markup shared by every shape of a kind, built once
+_RECT_TAIL_XML = (
+    '<p:style><a:lnRef idx="1"><a:schemeClr val="accent1"/></a:lnRef><a:fillRef idx="3"><a:schemeClr val="accent1"/></a:fillRef>'
+    '<a:effectRef idx="2"><a:schemeClr val="accent1"/></a:effectRef><a:fontRef idx="minor"><a:schemeClr val="lt1"/></a:fontRef></p:style>'
+    '<p:txBody><a:bodyPr rtlCol="0" anchor="ctr"/><a:lstStyle/><a:p><a:pPr algn="ctr"/></a:p></p:txBody></p:sp>'
+)
+_TEXTBOX_BODY_PR_XML = '<a:bodyPr wrap="square" tIns="{0}" bIns="{0}" lIns="{0}" rIns="{0}"><a:noAutofit/></a:bodyPr>'.format(Pt(2))
+
+@functools.lru_cache(maxsize=256)
+def _solid_fill_xml(rgb):
+    return f'<a:solidFill><a:srgbClr val="{rgb}"/></a:solidFill>'
+
+def _xfrm_xml(x, y, cx, cy):
+    return f'<a:xfrm><a:off x="{x}" y="{y}"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm><a:prstGeom prst="rect"><a:avLst/></a:prstGeom>'
+
+def rectangle_xml(shape_id, shape):
+    """<p:sp> for a background shape, equivalent to add_shape(MSO_SHAPE.RECTANGLE, ...) plus fill/line."""
+    fill_color = rgb_hex(shape['bg'])
+    line_xml = None
+    if shape['isAccent']:
+        fill_xml = _solid_fill_xml('F3F4F6')
+        line_xml = '<a:ln><a:noFill/></a:ln>'
+    elif fill_color:
+        fill_xml = _solid_fill_xml(fill_color)
+    else:
+        fill_xml = '<a:noFill/>'
+
+    border_color = rgb_hex(shape['border'])
+    if shape['borderWidth'] > 0 and border_color:
+        line_xml = f'<a:ln w="{Pt(shape["borderWidth"])}">{_solid_fill_xml(border_color)}</a:ln>'
+    elif line_xml is None:
+        line_xml = '<a:ln><a:noFill/></a:ln>'
+
+    return (
+        f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="Rectangle {shape_id - 1}"/><p:cNvSpPr/><p:nvPr/></p:nvSpPr>'
+        f'<p:spPr>{_xfrm_xml(Inches(shape["x"] * PX_TO_INCH), Inches(shape["y"] * PX_TO_INCH), Inches(shape["w"] * PX_TO_INCH), Inches(shape["h"] * PX_TO_INCH))}'
+        f'{fill_xml}{line_xml}</p:spPr>{_RECT_TAIL_XML}'
+    )
+
+def picture_xml(shape_id, rId, desc, x, y, cx, cy):
+    """<p:pic> for an image already related to the slide as rId, equivalent to add_picture()."""
+    return (
+        f'<p:pic><p:nvPicPr><p:cNvPr id="{shape_id}" name="Picture {shape_id - 1}" descr={quoteattr(desc)}/>'
+        '<p:cNvPicPr><a:picLocks noChangeAspect="1"/></p:cNvPicPr><p:nvPr/></p:nvPicPr>'
+        f'<p:blipFill><a:blip r:embed="{rId}"/><a:stretch><a:fillRect/></a:stretch></p:blipFill>'
+        f'<p:spPr>{_xfrm_xml(x, y, cx, cy)}</p:spPr></p:pic>'
+    )
+
+@functools.lru_cache(maxsize=1024)
+def _run_props_xml(text_style, decoration, link_rId):
+    """<a:rPr> for one text style; a deck repeats a handful of these across all its runs."""
+    rgb, font_size, font_name, bold = text_style
+    attrs = ''
+    if font_size:
+        attrs += f' sz="{font_size}"'
+    if bold:
+        attrs += ' b="1"'
+    # Handle text decoration (underline, strikethrough)
+    if decoration and 'underline' in decoration:
+        attrs += ' u="sng"'
+    if decoration and ('line-through' in decoration or 'strikethrough' in decoration):
+        attrs += ' strike="sngStrike"'
+    children = _solid_fill_xml(rgb) if rgb else ''
+    children += f'<a:latin typeface={quoteattr(font_name)}/>'
+    if link_rId:
+        children += f'<a:hlinkClick r:id="{link_rId}"/>'
+    return f'<a:rPr{attrs}>{children}</a:rPr>'
+
+def textbox_xml(shape_id, x, y, cx, cy, content, align, text_style, decoration, link_rId):
+    """<p:sp> text box holding one styled paragraph, equivalent to the add_textbox() formatting."""
+    run_props = _run_props_xml(text_style, decoration, link_rId)
+
+    # Line breaks become <a:br/> like python-pptx's paragraph text setter, but every line keeps the run style
+    lines = [_RE_XML_ILLEGAL.sub('', line) for line in _RE_LINE_BREAK.split(content)]
+    runs = '<a:br/>'.join(f'<a:r>{run_props}<a:t>{escape(line)}</a:t></a:r>' for line in lines)
+
+    return (
+        f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="TextBox {shape_id - 1}"/><p:cNvSpPr txBox="1"/><p:nvPr/></p:nvSpPr>'
+        f'<p:spPr>{_xfrm_xml(x, y, cx, cy)}<a:noFill/></p:spPr>'
+        f'<p:txBody>{_TEXTBOX_BODY_PR_XML}'
+        f'<a:lstStyle/><a:p><a:pPr algn="{PP_ALIGN.to_xml(align)}"/>{runs}</a:p></p:txBody></p:sp>'
+    )
+
+def relate_cached_image(slide, image_parts, image_stream):
+    """Relate an image to the slide, reusing the image part of identical content already in the deck.
+
+    image_parts maps a content hash to its ImagePart and is shared across all slides of one
+    presentation, so repeated icons are hashed once and skip python-pptx's parse + SHA1 lookup.
+    Returns (image_part, rId).
+    """
+    key = hashlib.blake2b(image_stream.getvalue(), digest_size=16).digest()
+    image_part = image_parts.get(key)
+    if image_part is None:
+        image_part, rId = slide.part.get_or_add_image_part(image_stream)
+        image_parts[key] = image_part
+        return image_part, rId
+    return image_part, slide.part.relate_to(image_part, RT.IMAGE)
+
+def optimize_image(image_data, max_width=MAX_IMAGE_WIDTH, max_height=MAX_IMAGE_HEIGHT, quality=SCREENSHOT_QUALITY):
+    """Optimize image bytes to reduce file size while maintaining quality. Returns a BytesIO for add_picture."""
     try:
-        with Image.open(image_path) as img:
-            # Calculate new dimensions maintaining aspect ratio
-            original_width, original_height = img.size
-            if original_width > max_width or original_height > max_height:
-                ratio = min(max_width/original_width, max_height/original_height)
-                new_width = int(original_width * ratio)
-                new_height = int(original_height * ratio)
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Save with optimized quality
-            img.save(image_path, optimize=True, quality=quality)
+        with Image.open(io.BytesIO(image_data)) as img:
+            # Opening only reads the header; an in-bounds JPEG is kept exactly as encoded
+            oversized = img.width > max_width or img.height > max_height
+            if not oversized and img.format == 'JPEG':
+                return io.BytesIO(image_data)
+
+            if oversized:
+                # JPEG decodes straight at a reduced scale; thumbnail keeps the aspect ratio and
+                # bilinear is indistinguishable from Lanczos for downscaled screenshots
+                img.draft('RGB', (max_width, max_height))
+                img.thumbnail((max_width, max_height), Image.Resampling.BILINEAR)
+
+            # Slide screenshots are opaque; JPEG is far smaller than re-deflating the PNG
+            optimized = io.BytesIO()
+            img.convert('RGB').save(optimized, format='JPEG', optimize=True, quality=quality)
+            optimized.seek(0)
+            return optimized
     except Exception as e:
-        print(f"Warning: Could not optimize image {image_path}: {e}")
+        print(f"Warning: Could not optimize image: {e}")
+        return io.BytesIO(image_data)
+
+async def open_deck_page(browser, html_uri):
+    """Load the deck in a fresh browser context and wait for it to settle."""
+    context = await browser.new_context(
+        viewport={'width': SLIDE_WIDTH_PX, 'height': SLIDE_HEIGHT_PX},
+        # Decks that honour prefers-reduced-motion skip their entrance animations
+        reduced_motion='reduce'
+    )
+    page = await context.new_page()
+    # goto() already waits for the load event; 'networkidle' rarely settles cleanly for
+    # file:// decks and used to burn its full timeout, so only wait for the slides to exist
+    await page.goto(html_uri)
+    
+    try:
+        await page.wait_for_selector('.slide', state='attached', timeout=2000)
+    except PlaywrightTimeoutError:
+        print(f"Warning: no .slide elements found in {html_uri}")
+    # Text boxes are measured from layout, so web fonts must be in before extract_slides runs;
+    # screenshots already wait for them
+    await page.evaluate('document.fonts.ready')
+    return page
+
+
+class SlideCapture:
+    """Clipped slide screenshots shared by both generators, so each slide is rasterized once.
+
+    Slide i is captured on pages[i % len(pages)]; clips use document coordinates, so captures
+    don't depend on any page's scroll position.
+    """
+
+    def __init__(self, pages, concurrency=CDP_CONCURRENCY):
+        self.pages = pages
+        self._sem = asyncio.Semaphore(concurrency)
+        self._tasks = {}
+
+    def png(self, index, bbox):
+        """Awaitable PNG bytes of slide `index`, starting the capture on first request."""
+        task = self._tasks.get(index)
+        if task is None:
+            task = self._tasks[index] = asyncio.ensure_future(self._capture(index, bbox))
+        return task
+
+    async def _capture(self, index, bbox):
+        page = self.pages[index % len(self.pages)]
+        async with self._sem:
+            return await page.screenshot(
+                type='png',
+                full_page=True,
+                clip={'x': bbox['x'], 'y': bbox['y'], 'width': bbox['w'], 'height': bbox['h']}
+            )
+
 
-async def generate_screenshot_pptx(html_uri, output_path):
+async def slide_boxes(page):
+    """Boxes of every .slide in document coordinates, for clipped screenshots."""
+    return await page.evaluate("""() => Array.from(document.querySelectorAll('.slide')).map(slide => {
+        const rect = slide.getBoundingClientRect();
+        return {x: rect.x + window.scrollX, y: rect.y + window.scrollY, w: rect.width, h: rect.height};
+    })""")
+
+
+async def generate_screenshot_pptx(capture, boxes, output_path):
     print(f"Generating Screenshot PPTX: {output_path}")
     prs = Presentation()
     prs.slide_width = PPTX_WIDTH
     prs.slide_height = PPTX_HEIGHT
     blank_slide_layout = prs.slide_layouts[6]
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page(viewport={'width': SLIDE_WIDTH_PX, 'height': SLIDE_HEIGHT_PX})
-        
-        print(f"Loading {html_uri}...")
-        await page.goto(html_uri)
-        
-        try:
-            await page.wait_for_load_state('networkidle', timeout=5000)
-        except:
-            pass
-
-        slides = await page.query_selector_all('.slide')
-        print(f"Found {len(slides)} slides.")
-
-        for i, slide in enumerate(slides):
-            screenshot_path = f"temp_slide_{i}.png"
-            await slide.screenshot(path=screenshot_path)
-            
-            # Optimize the image before adding to presentation
-            optimize_image(screenshot_path)
-            
-            pptx_slide = prs.slides.add_slide(blank_slide_layout)
-            pptx_slide.shapes.add_picture(
-                screenshot_path, 
-                0, 0, 
-                width=prs.slide_width, 
-                height=prs.slide_height
-            )
-            if os.path.exists(screenshot_path):
-                os.remove(screenshot_path)
-
-        await browser.close()
-
-    prs.save(output_path)
+    print(f"Found {len(boxes)} slides.")
+
+    # Start every capture up front and insert each slide as soon as its screenshot lands,
+    # so python-pptx work on slide N overlaps Chromium rendering of the slides after it
+    capture_tasks = [
+        capture.png(i, bbox) if bbox['w'] >= 1 and bbox['h'] >= 1 else None
+        for i, bbox in enumerate(boxes)
+    ]
+
+    for task in capture_tasks:
+        pptx_slide = prs.slides.add_slide(blank_slide_layout)
+        if task is None: continue
+
+        # The lossless capture is shared with the editable crops; JPEG-encode (and shrink
+        # oversized slides) on a worker thread so the event loop keeps driving captures
+        image_stream = await asyncio.to_thread(optimize_image, await task)
+        pptx_slide.shapes.add_picture(
+            image_stream, 
+            0, 0, 
+            width=prs.slide_width, 
+            height=prs.slide_height
+        )
+
+    # Zip and write on a worker thread so the other deck keeps building meanwhile
+    await asyncio.to_thread(prs.save, output_path)
     print(f"Saved {output_path}")
 
 
-async def generate_editable_pptx(html_uri, output_path):
+async def extract_slides(page):
+    """Walk every .slide in a single evaluate. Returns one {bbox, shapes, images, texts} dict per slide."""
+    return await page.evaluate("""(imageSelector) => Array.from(document.querySelectorAll('.slide')).map(slide => {
+        const slideRect = slide.getBoundingClientRect();
+        // SVG internals (paths, groups, glyphs) are often most of a slide's nodes but can't be
+        // shapes or text boxes of their own; the <svg> itself is still captured as an image
+        const allEls = slide.querySelectorAll('*:not(svg *)');
+        // Computed style and box of every element, resolved once and shared by all layers
+        const meta = new Map();
+        allEls.forEach(el => meta.set(el, {style: window.getComputedStyle(el), rect: el.getBoundingClientRect()}));
+        const shapes = [];
+        const images = [];
+        const texts = [];
+
+        // Stands in for Playwright's is_visible(), plus fully transparent elements which
+        // would otherwise turn into opaque shapes, blank pictures or stray text boxes
+        function isVisible(style, rect) {
+            return rect.width >= 1 && rect.height >= 1 &&
+                style.display !== 'none' && style.visibility !== 'hidden' &&
+                parseFloat(style.opacity) > 0;
+        }
+
+        // Computed colors packed as 0xRRGGBB ints so Python never parses 'rgb(...)' strings;
+        // null for fully transparent, black for anything that isn't rgb()/rgba()
+        function parseColor(s) {
+            if (!s || s === 'transparent') return null;
+            const m = s.match(/[\d.]+/g);
+            if (!m || m.length < 3) return 0;
+            // Only a single rgba() value carries alpha; multi-value shorthands list one color per side
+            if (s.startsWith('rgba(') && m.length === 4 && parseFloat(m[3]) === 0) return null;
+            return (Math.round(m[0]) << 16) | (Math.round(m[1]) << 8) | Math.round(m[2]);
+        }
+
+        // --- LAYER 1: BACKGROUND SHAPES / LAYER 2: IMAGE TARGETS ---
+        meta.forEach(({style, rect}, el) => {
+            if (!isVisible(style, rect)) return;
+
+            if (el.matches(imageSelector)) {
+                images.push({
+                    x: rect.x - slideRect.x,
+                    y: rect.y - slideRect.y,
+                    w: rect.width,
+                    h: rect.height
+                });
+            }
+        
+            const hasBg = style.backgroundColor !== 'rgba(0, 0, 0, 0)' && style.backgroundColor !== 'transparent';
+            const hasBorder = style.borderWidth !== '0px' && style.borderStyle !== 'none' && style.borderColor !== 'rgba(0, 0, 0, 0)';
+            const isAccent = el.classList.contains('accent-bar');
+            const isSection = el.classList.contains('slide-section');
+
+            if (hasBg || hasBorder || isAccent || isSection) {
+                if (el.classList.contains('slide')) return;
+                shapes.push({
+                    x: rect.x - slideRect.x,
+                    y: rect.y - slideRect.y,
+                    w: rect.width,
+                    h: rect.height,
+                    bg: parseColor(style.backgroundColor),
+                    border: parseColor(style.borderLeftColor),
+                    borderWidth: parseFloat(style.borderLeftWidth) || 0,
+                    isAccent: isAccent
+                });
+            }
+        });
+
+        // --- LAYER 3: TEXT ---
+        // Enhanced text extraction with support for more HTML elements and nested structures
+    
+        // Function to recursively extract text content while preserving structure
+        function extractTextContent(element) {
+            let textContent = '';
+            const directTextNodes = Array.from(element.childNodes).filter(node => 
+                node.nodeType === 3 && node.nodeValue.trim().length > 0
+            );
+        
+            directTextNodes.forEach(node => {
+                textContent += node.nodeValue;
+            });
+        
+            return textContent.trim();
+        }
+    
+        // Function to check if element has direct text content
+        function hasDirectText(el) {
+            return Array.from(el.childNodes).some(node => 
+                node.nodeType === 3 && node.nodeValue.trim().length > 0
+            );
+        }
+    
+        // Function to get all text content including nested elements
+        function getAllTextContent(element) {
+            let text = '';
+            const walker = document.createTreeWalker(
+                element,
+                NodeFilter.SHOW_TEXT,
+                null,
+                false
+            );
+        
+            let node;
+            while (node = walker.nextNode()) {
+                text += node.nodeValue;
+            }
+            return text.trim();
+        }
+    
+        // More comprehensive selector for various text elements
+        const textSelectors = [
+            'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+            'p', 'span', 'div', 'a', 'strong', 'b', 'em', 'i', 'u', 's', 'sub', 'sup',
+            'li', 'td', 'th', 'caption', 'legend', 'label', 'button', 'input[type="button"]',
+            '.text', '.content', '.title', '.subtitle', '.headline', '.subheadline',
+            '.paragraph', '.description', '.note', '.caption', '.quote', '.blockquote',
+            '.highlight', '.emphasis', '.important', '.warning', '.alert', '.info',
+            '.header', '.footer', '.sidebar', '.nav', '.menu', '.breadcrumb',
+            '.tag', '.badge', '.chip', '.tooltip', '.popover', '.modal',
+            '.card', '.panel', '.box', '.section', '.container', '.wrapper'
+        ];
+    
+        // Elements already turned into text boxes; several selectors can match the same node
+        const processed = new WeakSet();
+
+        // Each text box is a flat row in the order unpacked by generate_editable_pptx, which
+        // keeps per-field key names out of the payload
+        function pushText(el, style, rect) {
+            // Hyperlink from the element itself or its enclosing anchor
+            const anchor = el.closest('a');
+            texts.push([
+                extractTextContent(el),
+                el.tagName,
+                rect.x - slideRect.x,
+                rect.y - slideRect.y,
+                rect.width,
+                rect.height,
+                parseColor(style.color),
+                parseFloat(style.fontSize) || null,
+                style.fontFamily,
+                style.fontWeight,
+                style.textAlign,
+                style.textTransform,
+                style.textDecoration,
+                anchor && anchor.href ? anchor.href : null
+            ]);
+            processed.add(el);
+        }
+
+        textSelectors.forEach(selector => {
+            const elements = slide.querySelectorAll(selector);
+            elements.forEach(el => {
+                if (processed.has(el) || !meta.has(el)) return;
+                if (el.closest('.viz-box') || el.closest('.dashboard-placeholder')) return;
+                if (el.tagName === 'I' || el.classList.contains('bi')) return;
+
+                if (hasDirectText(el)) {
+                    const {style, rect} = meta.get(el);
+                    if (isVisible(style, rect)) pushText(el, style, rect);
+                }
+            });
+        });
+    
+        // Also check for any other elements that might contain text
+        allEls.forEach(el => {
+            if (el.closest('.viz-box') || el.closest('.dashboard-placeholder')) return;
+            if (el.tagName === 'I' || el.classList.contains('bi')) return;
+            if (el.tagName === 'IMG' || el.tagName === 'SVG' || el.tagName === 'CANVAS') return;
+        
+            // Skip elements already processed by the specific selectors
+            if (!processed.has(el) && hasDirectText(el)) {
+                const {style, rect} = meta.get(el);
+                if (isVisible(style, rect)) pushText(el, style, rect);
+            }
+        });
+    
+        // Slide box in document coordinates, so the clip does not depend on scroll position
+        const bbox = {
+            x: slideRect.x + window.scrollX,
+            y: slideRect.y + window.scrollY,
+            w: slideRect.width,
+            h: slideRect.height
+        };
+        return {bbox, shapes, images, texts};
+    })""", ', '.join(IMAGE_SELECTORS))
+
+
+def crop_images(png_bytes, boxes):
+    """Crop (left, top, right, bottom) boxes out of a slide screenshot. Returns [(stream, left, top, w, h)]."""
+    crops = []
+    with Image.open(io.BytesIO(png_bytes)) as slide_img:
+        slide_img = slide_img.convert('RGB')
+        for left, top, right, bottom in boxes:
+            buf = io.BytesIO()
+            slide_img.crop((left, top, right, bottom)).save(buf, 'JPEG', quality=SCREENSHOT_QUALITY, optimize=True)
+            buf.seek(0)
+            crops.append((buf, left, top, right - left, bottom - top))
+    return crops
+
+
+async def _process_slide(capture, index, slide_data):
+    """Crop the image targets of one extracted slide. Returns None if the slide has no box."""
+    bbox = slide_data['bbox']
+    if bbox['w'] < 1 or bbox['h'] < 1: return None
+
+    boxes = []
+    for target in slide_data['images']:
+        # Clamp to the slide so overflowing elements don't pick up empty padding
+        left = max(0, round(target['x']))
+        top = max(0, round(target['y']))
+        right = min(round(bbox['w']), round(target['x'] + target['w']))
+        bottom = min(round(bbox['h']), round(target['y'] + target['h']))
+        if right - left < 1 or bottom - top < 1: continue
+        boxes.append((left, top, right, bottom))
+
+    # One screenshot of the slide, shared with the screenshot pass; image targets are
+    # cropped from it in memory
+    images = []
+    if boxes:
+        png_bytes = await capture.png(index, bbox)
+        # Decode/crop/encode is CPU-bound; Pillow drops the GIL for it, so keep it off the event loop
+        images = await asyncio.to_thread(crop_images, png_bytes, boxes)
+
+    return {'shapes': slide_data['shapes'], 'images': images, 'texts': slide_data['texts']}
+
+
+async def generate_editable_pptx(capture, extraction, output_path):
     print(f"Generating Editable PPTX: {output_path}")
     prs = Presentation()
     prs.slide_width = PPTX_WIDTH
     prs.slide_height = PPTX_HEIGHT
     blank_layout = prs.slide_layouts[6]
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page(viewport={'width': SLIDE_WIDTH_PX, 'height': SLIDE_HEIGHT_PX})
-        
-        await page.goto(html_uri)
-        try:
-            await page.wait_for_load_state('networkidle', timeout=5000)
-        except:
-            pass
-
-        slide_handles = await page.query_selector_all('.slide')
-        
-        for i, slide_handle in enumerate(slide_handles):
-            slide = prs.slides.add_slide(blank_layout)
-            slide_box = await slide_handle.bounding_box()
-            if not slide_box: continue
-            slide_x, slide_y = slide_box['x'], slide_box['y']
-
-            # --- LAYER 1: BACKGROUND SHAPES ---
-            shapes_data = await slide_handle.evaluate("""(slide) => {
-                const results = [];
-                const slideRect = slide.getBoundingClientRect();
-                const allEls = slide.querySelectorAll('*');
-                
-                allEls.forEach(el => {
-                    const style = window.getComputedStyle(el);
-                    const rect = el.getBoundingClientRect();
-                    if (rect.width < 1 || rect.height < 1 || style.display === 'none' || style.visibility === 'hidden') return;
-                    
-                    const hasBg = style.backgroundColor !== 'rgba(0, 0, 0, 0)' && style.backgroundColor !== 'transparent';
-                    const hasBorder = style.borderWidth !== '0px' && style.borderStyle !== 'none' && style.borderColor !== 'rgba(0, 0, 0, 0)';
-                    const isAccent = el.classList.contains('accent-bar');
-                    const isSection = el.classList.contains('slide-section');
-
-                    if (hasBg || hasBorder || isAccent || isSection) {
-                        if (el.classList.contains('slide')) return;
-                        results.push({
-                            x: rect.x - slideRect.x,
-                            y: rect.y - slideRect.y,
-                            w: rect.width,
-                            h: rect.height,
-                            bg: style.backgroundColor,
-                            border: style.borderColor,
-                            borderWidth: parseFloat(style.borderLeftWidth) || 0,
-                            isAccent: isAccent
-                        });
-                    }
-                });
-                return results;
-            }""")
-
-            for shape in shapes_data:
-                x = Inches(shape['x'] * PX_TO_INCH)
-                y = Inches(shape['y'] * PX_TO_INCH)
-                w = Inches(shape['w'] * PX_TO_INCH)
-                h = Inches(shape['h'] * PX_TO_INCH)
-                
-                sp = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, x, y, w, h)
-                
-                fill_color = css_rgb_to_pptx_color(shape['bg'])
-                if shape['isAccent']:
-                    sp.fill.solid()
-                    sp.fill.fore_color.rgb = RGBColor(243, 244, 246)
-                    sp.line.fill.background()
-                elif fill_color:
-                    sp.fill.solid()
-                    sp.fill.fore_color.rgb = fill_color
-                else:
-                    sp.fill.background()
-
-                if shape['borderWidth'] > 0:
-                    sp.line.color.rgb = css_rgb_to_pptx_color(shape['border'])
-                    sp.line.width = Pt(shape['borderWidth'])
-                else:
-                    sp.line.fill.background()
-
-            # --- LAYER 2: IMAGES ---
-            # Extended selector list to include more HTML elements
-            image_selectors = [
-                '.viz-box', '.dashboard-placeholder', '.bi', '.corner-icon', '.fa', 
-                'img', 'svg', 'picture', 'canvas', 'video', 'figure', 'figcaption',
-                '.image', '.photo', '.graphic', '.icon', '.logo', '.avatar',
-                '.thumbnail', '.poster', '.banner', '.header-image', '.footer-image'
-            ]
-            
-            for selector in image_selectors:
-                elements = await slide_handle.query_selector_all(selector)
-                for el in elements:
-                    if not await el.is_visible(): continue
-                    
-                    box = await el.bounding_box()
-                    if not box or box['width'] < 1: continue
-                    
-                    rel_x = box['x'] - slide_x
-                    rel_y = box['y'] - slide_y
-                    
-                    screenshot_path = f"temp_img_{i}_{int(rel_x)}_{int(rel_y)}.png"
-                    try:
-                        await el.screenshot(path=screenshot_path)
-                        
-                        # Optimize the image before adding to presentation
-                        optimize_image(screenshot_path)
-                        
-                        slide.shapes.add_picture(
-                            screenshot_path, 
-                            Inches(rel_x * PX_TO_INCH), 
-                            Inches(rel_y * PX_TO_INCH),
-                            width=Inches(box['width'] * PX_TO_INCH),
-                            height=Inches(box['height'] * PX_TO_INCH)
-                        )
-                        if os.path.exists(screenshot_path):
-                            os.remove(screenshot_path)
-                    except:
-                        pass
-
-            # --- LAYER 3: TEXT ---
-            # Enhanced text extraction with support for more HTML elements and nested structures
-            text_data = await slide_handle.evaluate("""(slide) => {
-                const results = [];
-                const slideRect = slide.getBoundingClientRect();
-                
-                // Function to recursively extract text content while preserving structure
-                function extractTextContent(element) {
-                    let textContent = '';
-                    const directTextNodes = Array.from(element.childNodes).filter(node => 
-                        node.nodeType === 3 && node.nodeValue.trim().length > 0
-                    );
-                    
-                    directTextNodes.forEach(node => {
-                        textContent += node.nodeValue;
-                    });
-                    
-                    return textContent.trim();
-                }
-                
-                // Function to check if element has direct text content
-                function hasDirectText(el) {
-                    return Array.from(el.childNodes).some(node => 
-                        node.nodeType === 3 && node.nodeValue.trim().length > 0
-                    );
-                }
-                
-                // Function to get all text content including nested elements
-                function getAllTextContent(element) {
-                    let text = '';
-                    const walker = document.createTreeWalker(
-                        element,
-                        NodeFilter.SHOW_TEXT,
-                        null,
-                        false
-                    );
-                    
-                    let node;
-                    while (node = walker.nextNode()) {
-                        text += node.nodeValue;
-                    }
-                    return text.trim();
-                }
-                
-                // More comprehensive selector for various text elements
-                const textSelectors = [
-                    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
-                    'p', 'span', 'div', 'a', 'strong', 'b', 'em', 'i', 'u', 's', 'sub', 'sup',
-                    'li', 'td', 'th', 'caption', 'legend', 'label', 'button', 'input[type="button"]',
-                    '.text', '.content', '.title', '.subtitle', '.headline', '.subheadline',
-                    '.paragraph', '.description', '.note', '.caption', '.quote', '.blockquote',
-                    '.highlight', '.emphasis', '.important', '.warning', '.alert', '.info',
-                    '.header', '.footer', '.sidebar', '.nav', '.menu', '.breadcrumb',
-                    '.tag', '.badge', '.chip', '.tooltip', '.popover', '.modal',
-                    '.card', '.panel', '.box', '.section', '.container', '.wrapper'
-                ];
-                
-                textSelectors.forEach(selector => {
-                    const elements = slide.querySelectorAll(selector);
-                    elements.forEach(el => {
-                        if (el.closest('.viz-box') || el.closest('.dashboard-placeholder')) return;
-                        if (el.tagName === 'I' || el.classList.contains('bi')) return;
-
-                        if (hasDirectText(el)) {
-                            const style = window.getComputedStyle(el);
-                            const rect = el.getBoundingClientRect();
-                            
-                            // Get text content preserving structure
-                            const textContent = extractTextContent(el);
-                            
-                            // Extract href for hyperlinks
-                            let href = null;
-                            if (el.tagName === 'A' && el.href) {
-                                href = el.href;
-                            }
-                            
-                            // Check if this element is inside an anchor tag
-                            const parentAnchor = el.closest('a');
-                            if (parentAnchor && !href) {
-                                href = parentAnchor.href;
-                            }
-                            
-                            results.push({
-                                text: textContent, 
-                                tagName: el.tagName,
-                                x: rect.x - slideRect.x,
-                                y: rect.y - slideRect.y,
-                                w: rect.width,
-                                h: rect.height,
-                                color: style.color,
-                                fontSize: style.fontSize,
-                                fontFamily: style.fontFamily,
-                                fontWeight: style.fontWeight,
-                                textAlign: style.textAlign,
-                                textTransform: style.textTransform,
-                                textDecoration: style.textDecoration,
-                                href: href, // Add hyperlink support
-                                isNested: el.parentElement !== slide // Flag if nested
-                            });
-                        }
-                    });
-                });
-                
-                // Also check for any other elements that might contain text
-                const allEls = slide.querySelectorAll('*');
-                allEls.forEach(el => {
-                    if (el.closest('.viz-box') || el.closest('.dashboard-placeholder')) return;
-                    if (el.tagName === 'I' || el.classList.contains('bi')) return;
-                    if (el.tagName === 'IMG' || el.tagName === 'SVG' || el.tagName === 'CANVAS') return;
-                    
-                    // Check if this element is already processed by the specific selectors
-                    const isAlreadyProcessed = results.some(r => {
-                        const existingEl = document.elementFromPoint(
-                            r.x + slideRect.x + r.w/2, 
-                            r.y + slideRect.y + r.h/2
-                        );
-                        return existingEl === el || el.contains(existingEl);
-                    });
-                    
-                    if (!isAlreadyProcessed && hasDirectText(el)) {
-                        const style = window.getComputedStyle(el);
-                        const rect = el.getBoundingClientRect();
-                        const textContent = extractTextContent(el);
-                        
-                        // Extract href for hyperlinks
-                        let href = null;
-                        if (el.tagName === 'A' && el.href) {
-                            href = el.href;
-                        }
-                        
-                        // Check if this element is inside an anchor tag
-                        const parentAnchor = el.closest('a');
-                        if (parentAnchor && !href) {
-                            href = parentAnchor.href;
-                        }
-                        
-                        results.push({
-                            text: textContent, 
-                            tagName: el.tagName,
-                            x: rect.x - slideRect.x,
-                            y: rect.y - slideRect.y,
-                            w: rect.width,
-                            h: rect.height,
-                            color: style.color,
-                            fontSize: style.fontSize,
-                            fontFamily: style.fontFamily,
-                            fontWeight: style.fontWeight,
-                            textAlign: style.textAlign,
-                            textTransform: style.textTransform,
-                            textDecoration: style.textDecoration,
-                            href: href, // Add hyperlink support
-                            isNested: el.parentElement !== slide
-                        });
-                    }
-                });
-                
-                return results;
-            }""")
-
-            for txt in text_data:
-                content = txt['text'].strip()
-                if not content: continue
-
-                tx = Inches(txt['x'] * PX_TO_INCH)
-                ty = Inches(txt['y'] * PX_TO_INCH)
-                tw = Inches(txt['w'] * PX_TO_INCH)
-                th = Inches(txt['h'] * PX_TO_INCH)
-
-                # Better text wrapping and overflow handling
-                # Ensure minimum dimensions for text boxes
-                if tw < Inches(0.5):
-                    tw = Inches(0.5)
-                if th < Inches(0.25):
-                    th = Inches(0.25)
-
-                textbox = slide.shapes.add_textbox(tx, ty, tw, th)
-                tf = textbox.text_frame
-                tf.word_wrap = True
-                tf.auto_size = False  # Disable auto-size for better control
-                
-                # Better text overflow handling
-                tf.fit_text = True  # Fit text to shape
-                tf.margin_top = Pt(2)
-                tf.margin_bottom = Pt(2)
-                tf.margin_left = Pt(2)
-                tf.margin_right = Pt(2)
-                
-                p_node = tf.paragraphs[0]
-                
-                # Handle special list items
-                if txt['tagName'] == 'LI' and not content.startswith("■"):
-                    content = "■ " + content
-
-                if txt['textTransform'] == 'uppercase':
-                    content = content.upper()
-
-                p_node.text = content
-                p_node.alignment = map_alignment(txt['textAlign'])
-                
-                run = p_node.runs[0]
-                rgb = css_rgb_to_pptx_color(txt['color'])
-                if rgb: 
-                    run.font.color.rgb = rgb
-                
-                # Handle font size with better precision
-                size_match = re.match(r'([\d.]+)px', txt['fontSize'])
-                if size_match:
-                    # Convert px to points (1px = 0.75pt)
-                    px_size = float(size_match.group(1))
-                    # Apply scaling factor for better visual match
-                    scaled_size = px_size * 0.75
-                    run.font.size = Pt(scaled_size) 
-                
-                # Font mapping for better typography preservation
-                font_family = txt['fontFamily'].lower()
-                matched_font = None
-                for key, value in FONT_MAPPING.items():
-                    if key in font_family:
-                        matched_font = value
-                        break
-                if matched_font:
-                    run.font.name = matched_font
-                else:
-                    # Fallback to common fonts
-                    if 'helvetica' in font_family: run.font.name = 'Helvetica'
-                    elif 'arial' in font_family: run.font.name = 'Arial'
-                    elif 'times' in font_family: run.font.name = 'Times New Roman'
-                    else: run.font.name = 'Calibri'  # Default to Calibri
-                
-                # Handle font weight
-                if 'bold' in str(txt['fontWeight']) or (str(txt['fontWeight']).isdigit() and int(txt['fontWeight']) >= 600):
-                    run.font.bold = True
-                
-                # Handle text decoration (underline, strikethrough)
-                if txt['textDecoration'] and 'underline' in txt['textDecoration']:
-                    run.font.underline = True
-                if txt['textDecoration'] and ('line-through' in txt['textDecoration'] or 'strikethrough' in txt['textDecoration']):
-                    run.font.strike = True
-                
-                # Add hyperlink support
-                if txt['href']:
-                    try:
-                        run.hyperlink.address = txt['href']
-                    except:
-                        pass  # If hyperlink fails, continue without it
-
-        await browser.close()
-
-    prs.save(output_path)
+    # Content hash -> ImagePart, so identical icons share one embedded image
+    image_parts = {}
+    # (color, fontSize, fontFamily, fontWeight) -> resolve_text_style() result
+    style_cache = {}
+
+    # extract_slides() result, started by main while the page pool loads; after it the browser
+    # is only asked for the slide screenshots shared through SlideCapture, which Pillow crops locally
+    slides_data = await extraction
+
+    # Capture all slides concurrently, then build the presentation in original order
+    results = await asyncio.gather(*[
+        _process_slide(capture, i, slide_data) for i, slide_data in enumerate(slides_data)
+    ])
+
+    for result in results:
+        slide = prs.slides.add_slide(blank_layout)
+        if result is None: continue
+
+        shape_id = slide.shapes._next_shape_id
+        elements = []
+
+        # --- LAYER 1: BACKGROUND SHAPES ---
+        for shape in result['shapes']:
+            elements.append(rectangle_xml(shape_id, shape))
+            shape_id += 1
+
+        # --- LAYER 2: IMAGES ---
+        for image_stream, rel_x, rel_y, w, h in result['images']:
+            image_part, rId = relate_cached_image(slide, image_parts, image_stream)
+            elements.append(picture_xml(
+                shape_id,
+                rId,
+                image_part.desc,
+                Inches(rel_x * PX_TO_INCH), 
+                Inches(rel_y * PX_TO_INCH),
+                Inches(w * PX_TO_INCH),
+                Inches(h * PX_TO_INCH)
+            ))
+            shape_id += 1
+
+        # --- LAYER 3: TEXT ---
+        for (text, tag_name, x, y, w, h, color, font_size, font_family, font_weight,
+             text_align, text_transform, text_decoration, href) in result['texts']:
+            content = text.strip()
+            if not content: continue
+
+            tx = Inches(x * PX_TO_INCH)
+            ty = Inches(y * PX_TO_INCH)
+            tw = Inches(w * PX_TO_INCH)
+            th = Inches(h * PX_TO_INCH)
+
+            # Better text wrapping and overflow handling
+            # Ensure minimum dimensions for text boxes
+            if tw < Inches(0.5):
+                tw = Inches(0.5)
+            if th < Inches(0.25):
+                th = Inches(0.25)
+
+            # Handle special list items
+            if tag_name == 'LI' and not content.startswith("■"):
+                content = "■ " + content
+
+            if text_transform == 'uppercase':
+                content = content.upper()
+
+            # A deck has only a handful of distinct text styles, so parse each one once
+            style_key = (color, font_size, font_family, font_weight)
+            text_style = style_cache.get(style_key)
+            if text_style is None:
+                text_style = style_cache[style_key] = resolve_text_style(*style_key)
+
+            # Add hyperlink support
+            link_rId = None
+            if href:
+                link_rId = slide.part.relate_to(href, RT.HYPERLINK, is_external=True)
+
+            elements.append(textbox_xml(
+                shape_id, tx, ty, tw, th, content,
+                map_alignment(text_align), text_style, text_decoration, link_rId
+            ))
+            shape_id += 1
+
+        # One parse and one shape-tree mutation per slide
+        if elements:
+            fragment = parse_xml(f'<p:spTree {nsdecls("p", "a", "r")}>{"".join(elements)}</p:spTree>')
+            slide.shapes._spTree.extend(list(fragment))
+
+    # Zip and write on a worker thread so the other deck keeps building meanwhile
+    await asyncio.to_thread(prs.save, output_path)
     print(f"Saved {output_path}")
 
 
 async def main():
     parser = argparse.ArgumentParser(description="Convert HTML presentation to PPTX (Screenshot & Editable)")
     parser.add_argument("input_file", help="Path to the HTML file")
+    parser.add_argument("--cdp-concurrency", type=int, default=CDP_CONCURRENCY,
+                        help=f"Maximum screenshot calls in flight against the browser (default: {CDP_CONCURRENCY})")
     args = parser.parse_args()
+    if args.cdp_concurrency < 1:
+        parser.error("--cdp-concurrency must be at least 1")
+
+    if not features.check('libjpeg_turbo'):
+        print("Warning: Pillow is built without libjpeg-turbo; image crops will be slower (see README)")
 
     input_path = os.path.abspath(args.input_file)
     if not os.path.exists(input_path):
@@ -527,8 +690,36 @@ async def main():
     
     html_uri = f"file://{input_path}"
 
-    await generate_screenshot_pptx(html_uri, output_screenshot)
-    await generate_editable_pptx(html_uri, output_editable)
+    # One browser serves both outputs
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        # Closing the browser also closes every pooled context; do it even when a pass fails
+        try:
+            print(f"Loading {html_uri}...")
+            page = await open_deck_page(browser, html_uri)
+            # The screenshot deck only needs slide boxes, so it can start capturing while the
+            # editable pass is still walking the DOM
+            boxes = await slide_boxes(page)
+            num_slides = len(boxes)
+            # The DOM walk runs on the first page while the rest of the pool loads
+            extraction = asyncio.create_task(extract_slides(page))
+
+            # Chromium renders screenshots of one page serially; a pool of pages in separate
+            # contexts lets slides be captured in parallel, up to one page per CPU and never
+            # more pages than screenshots allowed in flight
+            pool_size = max(1, min(num_slides, os.cpu_count() or 1, args.cdp_concurrency))
+            pages = [page] + list(await asyncio.gather(*[
+                open_deck_page(browser, html_uri) for _ in range(pool_size - 1)
+            ]))
+
+            # Both passes only read the pages and share one set of slide screenshots
+            capture = SlideCapture(pages, args.cdp_concurrency)
+            await asyncio.gather(
+                generate_screenshot_pptx(capture, boxes, output_screenshot),
+                generate_editable_pptx(capture, extraction, output_editable)
+            )
+        finally:
+            await browser.close()
     
     print("Done.")
 